@@ -1,14 +1,15 @@
 import json
 from abc import abstractmethod
+from collections import defaultdict
 from random import random
-from typing import Any, Dict, List, Optional, Tuple, Union
+from string import Formatter
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from .artifact import Artifact
 from .collections import ListCollection
-from .dataclass import NonPositionalField
+from .dataclass import InternalField, NonPositionalField
 from .operator import InstanceOperator
 from .random_utils import new_random_generator
-from .type_utils import isoftype
 
 
 class TemplateFormatKeyError(KeyError):
@@ -20,6 +21,133 @@ class TemplateFormatKeyError(KeyError):
         )
 
 
+_FORMAT_CACHE: Dict[str, Callable[[Dict[str, Any]], str]] = {}
+_CHOICE_FORMAT_CACHE: Dict[str, Callable[[Any, Any], str]] = {}
+_CHOICE_FORMAT_ARGS = ("choice_numeral", "choice_text")
+_SPAN_LABEL_FORMAT_CACHE: Dict[str, Callable[[Any, Any], str]] = {}
+_SPAN_LABEL_FORMAT_ARGS = ("span", "label")
+
+
+def _compile_field(field_name, format_spec, conversion, arg_names, namespace):
+    """Returns the f-string replacement field of a parsed format field, or None if it cannot be compiled."""
+    if (
+        field_name == ""
+        or field_name.isdigit()
+        or "." in field_name
+        or "[" in field_name
+        or "{" in format_spec
+        or conversion not in (None, "r", "s", "a")
+    ):
+        return None
+    if arg_names is None:
+        key = f"_k{len(namespace)}"
+        namespace[key] = field_name
+        field = f"_d[{key}]"
+    elif field_name in arg_names:
+        field = field_name
+    else:
+        return None
+    if conversion is not None:
+        field += f"!{conversion}"
+    if format_spec:
+        spec = f"_s{len(namespace)}"
+        namespace[spec] = format_spec
+        field += f":{{{spec}}}"
+    return f"{{{field}}}"
+
+
+def _compile_format(
+    format_str: str, arg_names: Optional[Tuple[str, ...]] = None
+) -> Callable:
+    """Compiles a format string into a function equivalent to ``format_str.format(**data)``.
+
+    Simple fields (optionally with a conversion and a literal format spec) are turned into a
+    single f-string expression, so rendering does not re-parse the format string on every call.
+    Format strings using positional, attribute, index or nested fields fall back to ``str.format``.
+
+    If ``arg_names`` is given, the returned function takes these values positionally instead of
+    a data dict, and only fields named in ``arg_names`` are compiled.
+    """
+    if arg_names is None:
+
+        def fallback(data):
+            return format_str.format(**data)
+
+    else:
+
+        def fallback(*args):
+            return format_str.format(**dict(zip(arg_names, args)))
+
+    try:
+        parsed = list(Formatter().parse(format_str))
+    except (TypeError, ValueError):
+        return fallback
+
+    namespace = {}
+    parts = []
+    for literal_text, field_name, format_spec, conversion in parsed:
+        parts.append(literal_text.replace("{", "{{").replace("}", "}}"))
+        if field_name is not None:
+            field = _compile_field(
+                field_name, format_spec, conversion, arg_names, namespace
+            )
+            if field is None:
+                return fallback
+            parts.append(field)
+
+    args = "_d" if arg_names is None else ", ".join(arg_names)
+    return eval(f"lambda {args}: f{''.join(parts)!r}", namespace)
+
+
+def _get_formatter(format_str: str) -> Callable[[Dict[str, Any]], str]:
+    formatter = _FORMAT_CACHE.get(format_str)
+    if formatter is None:
+        formatter = _FORMAT_CACHE[format_str] = _compile_format(format_str)
+    return formatter
+
+
+def _get_choice_formatter(choice_format: str) -> Callable[[Any, Any], str]:
+    """Returns a function of (choice_numeral, choice_text) that renders ``choice_format``."""
+    formatter = _CHOICE_FORMAT_CACHE.get(choice_format)
+    if formatter is None:
+        formatter = _CHOICE_FORMAT_CACHE[choice_format] = _compile_format(
+            choice_format, _CHOICE_FORMAT_ARGS
+        )
+    return formatter
+
+
+def _get_span_label_formatter(span_label_format: str) -> Callable[[Any, Any], str]:
+    """Returns a function of (span, label) that renders ``span_label_format``."""
+    formatter = _SPAN_LABEL_FORMAT_CACHE.get(span_label_format)
+    if formatter is None:
+        formatter = _SPAN_LABEL_FORMAT_CACHE[span_label_format] = _compile_format(
+            span_label_format, _SPAN_LABEL_FORMAT_ARGS
+        )
+    return formatter
+
+
+def _freeze(value: Any) -> Any:
+    """Returns a hashable key for ``value`` that tells apart any two values rendering differently.
+
+    The key keeps the order of dict items and the exact type of every value.
+    Raises TypeError for values that are not plain str, int, float, bool, None,
+    list, tuple or dict.
+    """
+    value_type = type(value)
+    if value_type is str:
+        return value
+    if value_type is float:
+        # repr tells apart floats that are equal but render differently, like 0.0 and -0.0
+        return (float, repr(value))
+    if value_type is int or value_type is bool or value is None:
+        return (value_type, value)
+    if value_type is dict:
+        return (dict, tuple((_freeze(k), _freeze(v)) for k, v in value.items()))
+    if value_type is list or value_type is tuple:
+        return (value_type, tuple(_freeze(v) for v in value))
+    raise TypeError(f"Cannot freeze value of type {value_type.__name__}")
+
+
 class Template(InstanceOperator):
     """The role of template is to take the fields of every instance and verbalize it.
 
@@ -30,6 +158,9 @@ class Template(InstanceOperator):
         postprocessors: a list of strings being artifact names of text processors, to be applied on the model output
         instruction: a formatting string that yields an instruction with potential participation of values from the "input_fields" part of the instance
         target_prefix: a string to be used to format the prompt. Not a formatting string.
+        in_place (bool): if True, the rendered fields are written into the processed instance itself rather than into a copy of it
+        needs_serialize (bool): if False, input and reference fields are formatted as they are, without joining list-valued fields into strings. Set it for templates whose fields never hold lists
+        render_cache_size (int): maximal number of rendered instances to memoize by their (preprocessed) input and reference fields, so that repeated instances are rendered once. Instances holding values other than plain str, int, float, bool, None, list, tuple or dict are not cached. 0 disables the cache
 
     """
 
@@ -40,6 +171,27 @@ class Template(InstanceOperator):
     instruction: str = NonPositionalField(default="")
     target_prefix: str = NonPositionalField(default="")
     title_fields: List[str] = NonPositionalField(default_factory=list)
+    in_place: bool = NonPositionalField(default=True)
+    needs_serialize: bool = NonPositionalField(default=True)
+    render_cache_size: int = NonPositionalField(default=0)
+    _render_cache: Dict[Tuple, Tuple] = InternalField(default_factory=dict)
+
+    _format_names = (
+        "instruction",
+        "target_prefix",
+        "input_format",
+        "output_format",
+        "reference",
+    )
+
+    def prepare(self):
+        super().prepare()
+        # compile every declared format string up front. The compiled formatters
+        # stay in the module level cache, keeping the template itself picklable
+        for format_name in self._format_names:
+            format_str = getattr(self, format_name, None)
+            if isinstance(format_str, str):
+                _get_formatter(format_str)
 
     def input_fields_to_instruction_and_target_prefix(self, input_fields):
         instruction = self.apply_formatting(
@@ -77,6 +229,35 @@ class Template(InstanceOperator):
         )
 
         self.set_titles(input_fields)
+        if self.render_cache_size > 0:
+            (
+                source,
+                instruction,
+                target_prefix,
+                target,
+                references,
+            ) = self._render_fields_cached(input_fields, reference_fields)
+        else:
+            (
+                source,
+                instruction,
+                target_prefix,
+                target,
+                references,
+            ) = self._render_fields(input_fields, reference_fields)
+
+        if not self.in_place:
+            instance = instance.copy()
+        instance["source"] = source
+        instance["target"] = target
+        instance["references"] = references
+        instance["instruction"] = instruction
+        instance["target_prefix"] = target_prefix
+        return instance
+
+    def _render_fields(
+        self, input_fields: Dict[str, Any], reference_fields: Dict[str, Any]
+    ) -> Tuple[str, str, str, str, List[str]]:
         source = self.input_fields_to_source(input_fields)
         instruction, target_prefix = self.input_fields_to_instruction_and_target_prefix(
             input_fields
@@ -84,15 +265,49 @@ class Template(InstanceOperator):
         target, references = self.reference_fields_to_target_and_references(
             reference_fields
         )
+        return source, instruction, target_prefix, target, references
 
-        return {
-            **instance,
-            "source": source,
-            "target": target,
-            "references": references,
-            "instruction": instruction,
-            "target_prefix": target_prefix,
-        }
+    def _render_fields_cached(
+        self, input_fields: Dict[str, Any], reference_fields: Dict[str, Any]
+    ) -> Tuple[str, str, str, str, List[str]]:
+        try:
+            key = (_freeze(input_fields), _freeze(reference_fields))
+        except TypeError:
+            return self._render_fields(input_fields, reference_fields)
+        rendered = self._render_cache.get(key)
+        if rendered is None:
+            (
+                source,
+                instruction,
+                target_prefix,
+                target,
+                references,
+            ) = self._render_fields(input_fields, reference_fields)
+            rendered = (source, instruction, target_prefix, target, tuple(references))
+            if len(self._render_cache) >= self.render_cache_size:
+                # evict the least recently used entry
+                del self._render_cache[next(iter(self._render_cache))]
+        else:
+            del self._render_cache[key]
+        self._render_cache[key] = rendered
+        source, instruction, target_prefix, target, references = rendered
+        return source, instruction, target_prefix, target, list(references)
+
+    def process_batch(
+        self, instances: List[Dict[str, Any]], stream_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Renders a list of instances at once.
+
+        Equivalent to calling process_instance on each instance, with the
+        verification and processing methods resolved once for the whole batch.
+        Streams are still rendered one instance at a time; this is meant for
+        callers holding a list of instances.
+        """
+        verify_instance = self.verify_instance
+        process = self.process
+        return [
+            process(verify_instance(instance), stream_name) for instance in instances
+        ]
 
     @abstractmethod
     def input_fields_to_source(self, input_fields: Dict[str, object]) -> str:
@@ -112,6 +327,8 @@ class Template(InstanceOperator):
         return self.postprocessors
 
     def serialize_data(self, data):
+        if not any(isinstance(v, list) for v in data.values()):
+            return data
         return {
             k: ", ".join(str(t) for t in v) if isinstance(v, list) else v
             for k, v in data.items()
@@ -120,10 +337,10 @@ class Template(InstanceOperator):
     def apply_formatting(
         self, data, data_type, format_str, format_name, serialize=False
     ) -> str:
-        if serialize:
+        if serialize and self.needs_serialize:
             data = self.serialize_data(data)
         try:
-            return format_str.format(**data)
+            return _get_formatter(format_str)(data)
         except KeyError as e:
             raise TemplateFormatKeyError(
                 self, data, data_type, format_str, format_name
@@ -218,6 +435,16 @@ class PairwiseChoiceTemplate(InputOutputTemplate):
     choice_b_label: str
     choice_tie_label: str
     shuffle: bool
+    _swapped_answers: Dict[str, str] = InternalField(default_factory=dict)
+
+    def prepare(self):
+        super().prepare()
+        # the answer each label turns into when choice_a and choice_b are swapped
+        self._swapped_answers = {
+            self.choice_tie_label: self.choice_tie_label,
+            self.choice_b_label: self.choice_a_label,
+            self.choice_a_label: self.choice_b_label,
+        }
 
     def verbalize_answer_field(self, reference_fields: Dict[str, object]):
         answer = reference_fields[self.answer_field]
@@ -243,15 +470,8 @@ class PairwiseChoiceTemplate(InputOutputTemplate):
             input_fields[self.choice_b_field] = choice_b_value
 
             answer = reference_fields[self.answer_field]
-            assert answer in [
-                self.choice_a_label,
-                self.choice_b_label,
-                self.choice_tie_label,
-            ]
-            if answer == self.choice_a_label:
-                reference_fields[self.answer_field] = self.choice_b_label
-            elif answer == self.choice_b_label:
-                reference_fields[self.answer_field] = self.choice_a_label
+            assert answer in self._swapped_answers
+            reference_fields[self.answer_field] = self._swapped_answers[answer]
 
         return input_fields, reference_fields
 
@@ -276,30 +496,44 @@ class DialogTemplate(InputOutputTemplate):
     dialog_fields: List[DialogFieldsData]
     turns_separator: str = "\n\n"
     label_separator: str = " "
+    _dialog_specs: List[Tuple[str, Dict[str, str]]] = InternalField(
+        default_factory=list
+    )
 
-    def process_dialog(self, input_fields: Dict[str, object]):
-        for dialog_fields in self.dialog_fields:
-            dialog = input_fields[dialog_fields.dialog_field]
-            # TODO: update isoftype method to support Literal verification and check
-            #  it's List[Tuple[Literal["user", "assistant", "system"], str]] (Issue #799)
-            assert isoftype(dialog, List[Tuple[str, str]])
-
-            user_role_label = dialog_fields.user_role_label
-            assistant_role_label = dialog_fields.assistant_role_label
-            system_role_label = dialog_fields.system_role_label
+    def prepare(self):
+        super().prepare()
+        self._dialog_specs = [
+            (
+                dialog_fields.dialog_field,
+                {
+                    "user": dialog_fields.user_role_label,
+                    "assistant": dialog_fields.assistant_role_label,
+                    "system": dialog_fields.system_role_label,
+                },
+            )
+            for dialog_fields in self.dialog_fields
+        ]
 
-            dialog_str = ""
+    def process_dialog(self, input_fields: Dict[str, object]):
+        turns_separator = self.turns_separator
+        label_separator = self.label_separator
+        for dialog_field, role_labels in self._dialog_specs:
+            dialog = input_fields[dialog_field]
+            # TODO: verify turn types are Literal["user", "assistant", "system"] (Issue #799)
+            assert isinstance(dialog, list)
+
+            turns = []
             for i, turn in enumerate(dialog):
-                (turn_type, turn_text) = turn
-                turns_separator = "" if i == 0 else self.turns_separator
-                if turn_type == "user":
-                    dialog_str += f"{turns_separator}{user_role_label}{self.label_separator}{turn_text}"
-                elif turn_type == "assistant":
-                    dialog_str += f"{turns_separator}{assistant_role_label}{self.label_separator}{turn_text}"
-                elif turn_type == "system":
-                    dialog_str += f"{turns_separator}{system_role_label}{self.label_separator}{turn_text}"
-
-            input_fields[dialog_fields.dialog_field] = dialog_str
+                # every turn must be a Tuple[str, str]
+                assert isinstance(turn, tuple)
+                turn_type, turn_text = turn
+                assert isinstance(turn_type, str) and isinstance(turn_text, str)
+                role_label = role_labels.get(turn_type)
+                if role_label is not None:
+                    separator = "" if i == 0 else turns_separator
+                    turns.append(f"{separator}{role_label}{label_separator}{turn_text}")
+
+            input_fields[dialog_field] = "".join(turns)
         return input_fields
 
     def preprocess_input_and_reference_fields(
@@ -332,6 +566,7 @@ class MultipleChoiceTemplate(Template):
     target_choice_format: str = "{choice_numeral}"
     enumerator: str = "capitals"
     shuffle_choices: bool = False
+    _prepared_inputs: Optional[Tuple] = InternalField(default=None)
 
     def prepare(self):
         super().prepare()
@@ -364,31 +599,38 @@ class MultipleChoiceTemplate(Template):
                 "XIX",
                 "XX",
             ]
+        self.enumerator = tuple(self.enumerator)
 
     def inputs_to_choices(self, data: Dict[str, object], choice_format: str) -> str:
         choices = data[self.choices_field]
-        enumrated_choices = []
-        for i, choice in enumerate(choices):
-            enumrated_choices.append(
-                choice_format.format(
-                    choice_text=choice,
-                    choice_numeral=self.enumerator[i],
-                )
-            )
-        return enumrated_choices
+        formatter = _get_choice_formatter(choice_format)
+        enumerator = self.enumerator
+        return [formatter(enumerator[i], choice) for i, choice in enumerate(choices)]
 
     def inputs_to_numerals(self, input_fields: Dict[str, object]) -> Tuple[str, str]:
-        return self.inputs_to_choices(input_fields, "{choice_numeral}")
+        enumerator = self.enumerator
+        return [
+            str(enumerator[i]) for i in range(len(input_fields[self.choices_field]))
+        ]
 
     def prepare_multiple_choice_inputs(
         self, input_fields: Dict[str, object]
     ) -> Dict[str, object]:
+        # while processing an instance, the source and the instruction are both
+        # formatted from the same input fields, so they are prepared only once
+        prepared_inputs = self._prepared_inputs
+        if prepared_inputs and prepared_inputs[0] is input_fields:
+            return prepared_inputs[1]
+
         choices = self.inputs_to_choices(input_fields, self.source_choice_format)
-        return {
+        result = {
             "numerals": self.inputs_to_numerals(input_fields),
             **input_fields,
             self.choices_field: self.choices_separator.join(choices),
         }
+        if prepared_inputs is not None:
+            self._prepared_inputs = (input_fields, result)
+        return result
 
     def input_fields_to_source(
         self, input_fields: Dict[str, object]
@@ -431,31 +673,40 @@ class MultipleChoiceTemplate(Template):
                     f"MultipleChoiceTemplate could not locate textual target '{target}' in choices list: {reference_fields[self.choices_field]}"
                 ) from e
 
-        choices = self.inputs_to_choices(reference_fields, self.target_choice_format)
-
-        try:
-            target = choices[target]
-        except IndexError as e:
+        choices = reference_fields[self.choices_field]
+        if not -len(choices) <= target < len(choices):
+            choices = self.inputs_to_choices(
+                reference_fields, self.target_choice_format
+            )
             raise IndexError(
                 f"MultipleChoiceTemplate cannot find index number {target} in choices: {choices}"
-            ) from e
+            )
+        if target < 0:
+            target += len(choices)
+
+        target = _get_choice_formatter(self.target_choice_format)(
+            self.enumerator[target], choices[target]
+        )
 
         return target, [target]
 
     def _shuffle_choices(self, instance):
         target_index = self.outputs_to_target_index(instance["reference_fields"])
-        original_label_choice = instance["reference_fields"][self.choices_field][
-            target_index
-        ]
         choices = instance["input_fields"][self.choices_field]
+        # normalizes a negative index, and raises IndexError if it is out of range
+        target_index = range(len(choices))[target_index]
         random_generator = new_random_generator(
             {**instance["input_fields"], **instance["reference_fields"]}
         )
-        random_generator.shuffle(choices)
+        # shuffling the positions draws the same permutation as shuffling the choices,
+        # and tracks where the target moved without searching for it by value
+        permutation = list(range(len(choices)))
+        random_generator.shuffle(permutation)
+        choices[:] = [choices[i] for i in permutation]
         instance["input_fields"][self.choices_field] = choices
         instance["reference_fields"][self.choices_field] = choices
-        instance["reference_fields"][self.target_field] = choices.index(
-            original_label_choice
+        instance["reference_fields"][self.target_field] = permutation.index(
+            target_index
         )
         return instance
 
@@ -464,7 +715,11 @@ class MultipleChoiceTemplate(Template):
     ) -> Dict[str, Any]:
         if self.shuffle_choices:
             instance = self._shuffle_choices(instance)
-        result = super().process(instance, stream_name)
+        self._prepared_inputs = ()
+        try:
+            result = super().process(instance, stream_name)
+        finally:
+            self._prepared_inputs = None
 
         if "options" not in result["reference_fields"]:
             result["reference_fields"]["options"] = self.inputs_to_choices(
@@ -553,7 +808,8 @@ class KeyValTemplate(Template):
     def process_dict(
         self, data: Dict[str, object], key_val_sep, pairs_sep, use_keys
     ) -> str:
-        data = self.serialize_data(data)
+        if self.needs_serialize:
+            data = self.serialize_data(data)
         pairs = []
         for key, val in data.items():
             key_val = [key, str(val)] if use_keys else [str(val)]
@@ -584,21 +840,30 @@ class KeyValTemplate(Template):
 
 class OutputQuantizingTemplate(InputOutputTemplate):
     quantum: Union[float, int] = 0.1  # Now supports both int and float
+    _quantum_is_int: bool = InternalField(default=False)
+    _quantum_str: str = InternalField(default=None)
+
+    def prepare(self):
+        super().prepare()
+        self._quantum_is_int = isinstance(self.quantum, int)
+        if not self._quantum_is_int:
+            # When quantum is a float, format quantized values with precision based on quantum
+            self._quantum_str = f"{self.quantum:.10f}".rstrip("0").rstrip(".")
 
     def reference_fields_to_target_and_references(
         self, reference_fields: Dict[str, object]
     ) -> str:
-        if isinstance(self.quantum, int):
+        quantum = self.quantum
+        if self._quantum_is_int:
             # When quantum is an int, format quantized values as ints
             quantized_outputs = {
-                key: f"{int(round(value / self.quantum) * self.quantum)}"
+                key: f"{int(round(value / quantum) * quantum)}"
                 for key, value in reference_fields.items()
             }
         else:
-            # When quantum is a float, format quantized values with precision based on quantum
-            quantum_str = f"{self.quantum:.10f}".rstrip("0").rstrip(".")
+            quantum_str = self._quantum_str
             quantized_outputs = {
-                key: f"{round(value / self.quantum) * self.quantum:{quantum_str}}"
+                key: f"{round(value / quantum) * quantum:{quantum_str}}"
                 for key, value in reference_fields.items()
             }
         return super().reference_fields_to_target_and_references(quantized_outputs)
@@ -635,7 +900,9 @@ class MultiReferenceTemplate(InputOutputTemplate):
         self, reference_fields: Dict[str, object]
     ) -> List[str]:
         references = reference_fields[self.references_field]
-        if not isoftype(references, List[str]):
+        if not isinstance(references, list) or not all(
+            isinstance(reference, str) for reference in references
+        ):
             raise ValueError(
                 f"MultiReferenceTemplate requires references field '{self.references_field}' to be List[str]. Got {self.references_field}<{type(references).__name__}>: {references}"
             )
@@ -665,20 +932,28 @@ class SpanLabelingBaseTemplate(MultiLabelTemplate):
     text_field: str = "text"
     labels_support: list = None
 
+    def prepare(self):
+        super().prepare()
+        if self.labels_support is not None:
+            self.labels_support = frozenset(self.labels_support)
+
     def extract_span_label_pairs(self, reference_fields):
         spans_starts = reference_fields[self.spans_starts_field]
         spans_ends = reference_fields[self.spans_ends_field]
         text = reference_fields[self.text_field]
         labels = reference_fields[self.labels_field]
+        labels_support = self.labels_support
 
-        spans = []
-        for span_start, span_end, label in zip(spans_starts, spans_ends, labels):
-            if self.labels_support is None or label in self.labels_support:
-                spans.append((span_start, span_end, text[span_start:span_end], label))
+        spans = [
+            (span_start, span_end, label)
+            for span_start, span_end, label in zip(spans_starts, spans_ends, labels)
+            if labels_support is None or label in labels_support
+        ]
+        # the span text is determined by its start and end, so it is left out of the sort key
+        spans.sort()
 
-        for span in sorted(spans):
-            if self.labels_support is None or span[3] in self.labels_support:
-                yield span[2], span[3]
+        for span_start, span_end, label in spans:
+            yield text[span_start:span_end], label
 
     def reference_fields_to_target_and_references(
         self, reference_fields: Dict[str, object]
@@ -696,14 +971,32 @@ class SpanLabelingTemplate(SpanLabelingBaseTemplate):
     span_label_format: str = "{span}: {label}"
     escape_characters: List[str] = [":", ","]
     postprocessors: List[str] = ["processors.to_span_label_pairs"]
+    _escape_table: Optional[Dict[int, str]] = InternalField(default=None)
+
+    def prepare(self):
+        super().prepare()
+        self._escape_table = None
+        chars = self.escape_characters
+        # a single translate pass is equivalent to escape_chars only for distinct,
+        # single characters where a backslash, which is introduced by escaping,
+        # is not escaped after other characters
+        if (
+            chars is not None
+            and all(len(char) == 1 for char in chars)
+            and len(set(chars)) == len(chars)
+            and "\\" not in chars[1:]
+        ):
+            self._escape_table = str.maketrans({char: f"\\{char}" for char in chars})
 
     def span_label_pairs_to_targets(self, span_label_pairs):
+        formatter = _get_span_label_formatter(self.span_label_format)
         targets = []
         for span, label in span_label_pairs:
-            if self.escape_characters is not None:
+            if self._escape_table is not None:
+                span = span.translate(self._escape_table)
+            elif self.escape_characters is not None:
                 span = escape_chars(span, self.escape_characters)
-            target = self.span_label_format.format(span=span, label=label)
-            targets.append(target)
+            targets.append(formatter(span, label))
         return targets
 
 
@@ -714,10 +1007,8 @@ class SpanLabelingJsonTemplate(SpanLabelingBaseTemplate):
     ]
 
     def span_label_pairs_to_targets(self, span_label_pairs):
-        groups = {}
+        groups = defaultdict(list)
         for span, label in span_label_pairs:
-            if label not in groups:
-                groups[label] = []
             groups[label].append(span)
         if len(groups) > 0:
             targets = [json.dumps(groups, ensure_ascii=False)]
@@ -9,7 +9,6 @@ from unitxt.artifact import (
 )
 from unitxt.catalog import add_to_catalog, get_from_catalog
 from unitxt.dataclass import UnexpectedArgumentError
-from unitxt.logging_utils import get_logger
 from unitxt.metrics import Accuracy, F1Binary
 from unitxt.operator import SequentialOperator
 from unitxt.operators import RenameFields, Set
@@ -20,7 +19,6 @@ from unitxt.test_utils.catalog import temp_catalog
 
 from tests.utils import UnitxtTestCase
 
-logger = get_logger()
 settings = get_settings()
 
 
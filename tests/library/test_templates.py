@@ -1,12 +1,18 @@
+import copy
+import pickle
 from typing import Dict, List, Tuple
+from unittest.mock import patch
 
 from unitxt.templates import (
+    DialogFieldsData,
+    DialogTemplate,
     InputOutputTemplate,
     InputOutputTemplateWithCustomTarget,
     KeyValTemplate,
     MultiLabelTemplate,
     MultipleChoiceTemplate,
     MultiReferenceTemplate,
+    OutputQuantizingTemplate,
     SpanLabelingJsonTemplate,
     SpanLabelingTemplate,
     Template,
@@ -848,3 +854,334 @@ class TestTemplates(UnitxtTestCase):
             "target_prefix": "",
         }
         self.assertDictEqual(result, target)
+
+    def test_render_template_with_format_specs_and_escaped_braces(self):
+        template = InputOutputTemplate(
+            input_format="{{{text!r}}} scored {score:.2f} of {scores[0]}",
+            output_format="{label:>4}",
+        )
+        instance = {
+            "input_fields": {"text": "it's", "score": 0.5, "scores": [1]},
+            "reference_fields": {"label": "ok"},
+        }
+
+        result = template.process(instance)
+        self.assertEqual(result["source"], '{"it\'s"} scored 0.50 of 1')
+        self.assertEqual(result["target"], "  ok")
+
+    def test_multiple_choice_template_instruction_with_choices(self):
+        template = MultipleChoiceTemplate(
+            input_format="Text: {text}",
+            instruction="Pick one of {numerals}: {choices}.",
+            target_prefix="Answer ({numerals}): ",
+        )
+        instance = {
+            "input_fields": {"choices": ["True", "False"], "text": "example A"},
+            "reference_fields": {"choices": ["True", "False"], "label": 1},
+        }
+
+        with patch.object(
+            template, "inputs_to_numerals", wraps=template.inputs_to_numerals
+        ) as inputs_to_numerals:
+            result = template.process(instance)
+        inputs_to_numerals.assert_called_once()
+        self.assertEqual(result["source"], "Text: example A")
+        self.assertEqual(result["instruction"], "Pick one of A, B: A. True, B. False.")
+        self.assertEqual(result["target_prefix"], "Answer (A, B): ")
+        self.assertEqual(result["target"], "B")
+
+    def test_multiple_choice_template_target_index_out_of_range(self):
+        template = MultipleChoiceTemplate(input_format="Text: {text}")
+        reference_fields = {"choices": ["True", "False"], "label": 2}
+
+        with self.assertRaises(IndexError) as ie:
+            template.reference_fields_to_target_and_references(reference_fields)
+        self.assertEqual(
+            "MultipleChoiceTemplate cannot find index number 2 in choices: ['A', 'B']",
+            str(ie.exception),
+        )
+
+        reference_fields["label"] = -1
+        self.assertEqual(
+            ("B", ["B"]),
+            template.reference_fields_to_target_and_references(reference_fields),
+        )
+
+    def test_multiple_choice_template_shuffle_choices_with_duplicates(self):
+        template = MultipleChoiceTemplate(
+            input_format="Text: {text}, Choices: {choices}.", shuffle_choices=True
+        )
+        # the target follows the labeled choice itself, not the first equal choice text
+        for label, expected_choices, expected_label, expected_target in [
+            (0, ["Yes", "Yes", "No"], 1, "B"),
+            (2, ["Yes", "No", "Yes"], 2, "C"),
+        ]:
+            with self.subTest(label=label):
+                result = template.process(
+                    {
+                        "input_fields": {
+                            "choices": ["Yes", "No", "Yes"],
+                            "text": "example B",
+                        },
+                        "reference_fields": {
+                            "choices": ["Yes", "No", "Yes"],
+                            "label": label,
+                        },
+                    }
+                )
+                self.assertListEqual(
+                    result["input_fields"]["choices"], expected_choices
+                )
+                self.assertEqual(result["reference_fields"]["label"], expected_label)
+                self.assertEqual(result["target"], expected_target)
+
+    def test_dialog_template(self):
+        template = DialogTemplate(
+            dialog_fields=[
+                DialogFieldsData(
+                    user_role_label="User:",
+                    assistant_role_label="Agent:",
+                    system_role_label="System:",
+                    dialog_field="dialog",
+                )
+            ],
+            turns_separator="\n",
+            label_separator=" ",
+            input_format="{dialog}",
+            output_format="{label}",
+        )
+        instance = {
+            "input_fields": {
+                "dialog": [
+                    ("system", "Be brief."),
+                    ("user", "Hi"),
+                    ("assistant", "Hello"),
+                ]
+            },
+            "reference_fields": {"label": "ok"},
+        }
+
+        result = template.process(instance)
+        self.assertEqual(result["source"], "System: Be brief.\nUser: Hi\nAgent: Hello")
+
+    def test_process_batch(self):
+        template = InputOutputTemplate(
+            input_format="Text: {text}", output_format="{label}"
+        )
+        instances = [
+            {
+                "input_fields": {"text": text},
+                "reference_fields": {"label": label},
+            }
+            for text, label in [("good", "positive"), ("bad", "negative")]
+        ]
+
+        expected = [
+            template.process_instance(copy.deepcopy(instance)) for instance in instances
+        ]
+        results = template.process_batch(instances)
+        self.assertListEqual(expected, results)
+        self.assertEqual(results[1]["source"], "Text: bad")
+
+    def test_template_pickle(self):
+        instance = {
+            "input_fields": {"text": "was so bad"},
+            "reference_fields": {"label": "negative"},
+        }
+        template = InputOutputTemplate(
+            input_format="Text: {text}",
+            output_format="{label}",
+            instruction="Classify:",
+        )
+        loaded_template = pickle.loads(pickle.dumps(template))
+        self.assertDictEqual(
+            template.process(dict(instance)), loaded_template.process(dict(instance))
+        )
+
+    def test_output_quantizing_template(self):
+        for quantum, expected_target in [(0.2, "3.2"), (5, "5"), (0.5, "3.5")]:
+            template = OutputQuantizingTemplate(
+                input_format="{text}", output_format="{score}", quantum=quantum
+            )
+            target, references = template.reference_fields_to_target_and_references(
+                {"score": 3.3}
+            )
+            self.assertEqual(target, expected_target)
+            self.assertListEqual(references, [expected_target])
+            loaded_template = pickle.loads(pickle.dumps(template))
+            self.assertEqual(
+                loaded_template.reference_fields_to_target_and_references(
+                    {"score": 3.3}
+                ),
+                (expected_target, [expected_target]),
+            )
+
+    def test_render_template_in_place(self):
+        instance = {
+            "input_fields": {"text": "was so bad"},
+            "reference_fields": {"label": "negative"},
+        }
+        template = InputOutputTemplate(input_format="{text}", output_format="{label}")
+        result = template.process(instance)
+        self.assertIs(result, instance)
+        self.assertEqual(instance["source"], "was so bad")
+
+        instance = {
+            "input_fields": {"text": "was so bad"},
+            "reference_fields": {"label": "negative"},
+        }
+        template = InputOutputTemplate(
+            input_format="{text}", output_format="{label}", in_place=False
+        )
+        result = template.process(instance)
+        self.assertIsNot(result, instance)
+        self.assertNotIn("source", instance)
+        self.assertEqual(result["source"], "was so bad")
+
+    def test_render_template_skip_rendered_instance_set_after_construction(self):
+        template = InputOutputTemplate(input_format="{text}", output_format="{label}")
+        rendered_instance = {
+            "input_fields": {"text": "was so bad"},
+            "reference_fields": {"label": "negative"},
+            "source": "x",
+            "target": "y",
+            "references": ["y"],
+        }
+        self.assertEqual(template.process(dict(rendered_instance))["source"], "x")
+
+        template.skip_rendered_instance = False
+        self.assertEqual(
+            template.process(dict(rendered_instance))["source"], "was so bad"
+        )
+
+    def test_render_template_without_serialize(self):
+        input_fields = {"text": "was so bad", "labels": ["positive", "negative"]}
+        reference_fields = {"label": ["negative", "bad"]}
+        for needs_serialize, expected_labels, expected_target in [
+            (True, "positive, negative", "negative, bad"),
+            (False, "['positive', 'negative']", "['negative', 'bad']"),
+        ]:
+            with self.subTest(needs_serialize=needs_serialize):
+                template = InputOutputTemplate(
+                    input_format="{text} {labels}",
+                    output_format="{label}",
+                    needs_serialize=needs_serialize,
+                )
+                self.assertEqual(
+                    template.input_fields_to_source(input_fields),
+                    f"was so bad {expected_labels}",
+                )
+                self.assertEqual(
+                    template.reference_fields_to_target_and_references(
+                        reference_fields
+                    ),
+                    (expected_target, [expected_target]),
+                )
+
+                template = KeyValTemplate(needs_serialize=needs_serialize)
+                self.assertEqual(
+                    template.input_fields_to_source(input_fields),
+                    f"text: was so bad, labels: {expected_labels}",
+                )
+                self.assertEqual(
+                    template.reference_fields_to_target_and_references(
+                        reference_fields
+                    ),
+                    (expected_target, [expected_target]),
+                )
+
+    def test_render_template_with_render_cache(self):
+        template = InputOutputTemplate(
+            input_format="{text}",
+            output_format="{label}",
+            skip_rendered_instance=False,
+            render_cache_size=2,
+        )
+        texts = [
+            "was so bad",
+            "was great",
+            "was so bad",
+            "was fine",
+            "was so bad",
+            "was great",
+        ]
+        with patch.object(
+            template, "_render_fields", wraps=template._render_fields
+        ) as render_fields:
+            for text in texts:
+                result = template.process(
+                    {
+                        "input_fields": {"text": text},
+                        "reference_fields": {"label": text.split()[-1]},
+                    }
+                )
+                self.assertEqual(result["source"], text)
+                self.assertEqual(result["target"], text.split()[-1])
+                self.assertEqual(result["references"], [text.split()[-1]])
+                result["references"].append("mutated")
+
+        # repeated texts are rendered from the cache, until evicted as least recently used
+        self.assertListEqual(
+            [call.args[0]["text"] for call in render_fields.call_args_list],
+            ["was so bad", "was great", "was fine", "was great"],
+        )
+
+    def test_render_template_with_render_cache_and_lookalike_values(self):
+        class Value:
+            def __init__(self, value):
+                self.value = value
+
+            def __repr__(self):
+                return "Value(...)"
+
+        template = InputOutputTemplate(
+            input_format="{x}",
+            output_format="{x.value}",
+            skip_rendered_instance=False,
+            render_cache_size=10,
+        )
+        for x, expected_source, expected_target in [
+            (1, "1", "1"),
+            (True, "True", "True"),
+            (0.0, "0.0", "0.0"),
+            (-0.0, "-0.0", "-0.0"),
+            (Value(0), "Value(...)", "0"),
+            (Value(7), "Value(...)", "7"),
+        ]:
+            result = template.process(
+                {
+                    "input_fields": {"x": x},
+                    "reference_fields": {"x": x if isinstance(x, Value) else Value(x)},
+                }
+            )
+            self.assertEqual(result["source"], expected_source)
+            self.assertEqual(result["target"], expected_target)
+
+    def test_span_labeling_template_with_labels_support(self):
+        template = SpanLabelingTemplate(
+            input_format="{text}", labels_support=["PER", "ORG"]
+        )
+        reference_fields = {
+            "spans_starts": [39, 0, 17],
+            "spans_ends": [45, 8, 25],
+            "labels": ["ORG", "PER", "LOC"],
+            "text": "John Doe is from New York and works at Google.",
+        }
+
+        target, _ = template.reference_fields_to_target_and_references(reference_fields)
+        self.assertEqual(target, "John Doe: PER, Google: ORG")
+
+    def test_span_labeling_template_escaping_without_translate_table(self):
+        for escape_characters, expected_span in [
+            ([":", ":"], r"a\\:b"),
+            ([":", "\\"], r"a\\:b"),
+            (["::"], r"a:b"),
+        ]:
+            with self.subTest(escape_characters=escape_characters):
+                template = SpanLabelingTemplate(
+                    input_format="{text}", escape_characters=escape_characters
+                )
+                self.assertEqual(
+                    template.span_label_pairs_to_targets([("a:b", "PER")]),
+                    [f"{expected_span}: PER"],
+                )